@@ -4,34 +4,56 @@ Parses RMF reports to extract APPL% CP Total by Service Class for TFP analysis.
 Optimized version with threading, caching, and improved error handling.
 """
 
-import re
 import os
-import glob
 import io
 import csv
 import time
 import logging
+import zlib
+import json
 import hashlib
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from dataclasses import dataclass, asdict
+from itertools import chain
 from typing import List, Tuple, Optional, Dict
 
-from flask import Flask, render_template, jsonify, request, send_file
+from flask import Flask, Response, render_template, jsonify, request, stream_with_context
 from werkzeug.utils import secure_filename
 from werkzeug.exceptions import RequestEntityTooLarge
 
+from rmf_parser import (
+    RMFRecord,
+    CSV_HEADER,
+    MAX_FILE_SIZE,
+    MAX_WORKERS,
+    CACHE_TTL_SECONDS,
+    parse_rmf_file,
+    parse_all_files,
+    clear_parse_cache,
+    cache_stats,
+)
+from rmf_store import SegmentStore, match_indices
+
+try:
+    import brotli  # Optional: enables "br" content encoding
+except ImportError:
+    brotli = None
+
 # ---------------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------------
 
-MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB max file size
-MAX_WORKERS = 4  # Thread pool workers for parallel parsing
-CACHE_MAXSIZE = 128  # LRU cache size
 PORT = 5001  # Server port
-CACHE_TTL_SECONDS = 300  # Parse cache TTL (5 minutes)
 RATE_LIMIT_MAX = 10  # Max uploads per IP per window
 RATE_LIMIT_WINDOW = 60  # Rate limit window in seconds
+COMPRESS_MIN_SIZE = 1024  # Bodies smaller than this are sent uncompressed
+COMPRESS_STREAM_THRESHOLD = 1024 * 1024  # Larger /api/data bodies are streamed
+COMPRESS_CHUNK_SIZE = 64 * 1024  # Chunk size for streamed JSON bodies
+COMPRESS_LEVEL = 6  # gzip/deflate level
+BROTLI_QUALITY = 5  # brotli quality (0-11)
+COMPRESS_CACHE_MAX_BYTES = 32 * 1024 * 1024  # Cached response bodies
+COMPRESS_MIMETYPES = {"application/json", "text/csv", "text/html", "text/plain"}
 
 _START_TIME = time.time()
 
@@ -56,255 +78,144 @@ def _check_rate_limit(ip: str) -> bool:
 
 
 # ---------------------------------------------------------------------------
-# Cache Stats
-# ---------------------------------------------------------------------------
-
-_cache_hits = 0
-_cache_misses = 0
-
-# ---------------------------------------------------------------------------
-# Data Model
+# Response Compression (negotiated, with cached compressed bodies)
 # ---------------------------------------------------------------------------
 
-@dataclass
-class RMFRecord:
-    timestamp: str        # MM/DD/YYYY HH.MM.SS
-    datetime_iso: str     # ISO format for JS
-    service_class: str
-    workload: str
-    period: int
-    appl_cp_total: float
-    file_source: str
-
-    def to_dict(self):
-        return asdict(self)
-
-# ---------------------------------------------------------------------------
-# RMF Parser (optimized state-machine approach)
-# ---------------------------------------------------------------------------
-
-# Compiled regex patterns
-RE_TIMESTAMP = re.compile(
-    r'START\s+(\d{2}/\d{2}/\d{4})-(\d{2}\.\d{2}\.\d{2})\s+INTERVAL'
-)
-RE_SERVICE_CLASS = re.compile(
-    r'WORKLOAD=(\w+)\s+SERVICE CLASS=(\w+)\s+.*?PERIOD=(\d+)'
-)
-RE_ALL_DATA_ZERO = re.compile(r'ALL DATA ZERO')
-RE_TOTAL_LINE = re.compile(
-    r'^\s*AVG\s+.*?TOTAL\s+([\d.]+)'
-)
-
-# Fast path strings for pre-filtering
-START_MARKER = "START "
-WORKLOAD_MARKER = "WORKLOAD="
-AVG_MARKER = "AVG"
-ALL_DATA_ZERO_MARKER = "ALL DATA ZERO"
-
-
-def _get_file_hash(filepath: str) -> str:
-    """Generate a hash based on file path, mtime, and size for caching."""
-    try:
-        stat = os.stat(filepath)
-        hash_input = f"{filepath}:{stat.st_mtime}:{stat.st_size}"
-        return hashlib.md5(hash_input.encode()).hexdigest()
-    except (OSError, IOError):
-        return None
+_COMPRESS_ENCODINGS = (["br"] if brotli else []) + ["gzip", "deflate"]
+_compress_lock = threading.Lock()
+# key -> (body bytes, uncompressed size)
+_compressed_cache: "OrderedDict[tuple, Tuple[bytes, int]]" = OrderedDict()
+_compressed_cache_bytes = 0
+_compression_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _new_compressor(encoding: str):
+    """Return (compress, flush) callables for a streaming compressor."""
+    if encoding == "br":
+        c = brotli.Compressor(quality=BROTLI_QUALITY)
+        return c.process, c.finish
+    wbits = 31 if encoding == "gzip" else 15  # gzip container vs zlib (HTTP deflate)
+    c = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, wbits)
+    return c.compress, c.flush
+
+
+def _compress_bytes(body: bytes, encoding: str) -> bytes:
+    compress, flush = _new_compressor(encoding)
+    return compress(body) + flush()
+
+
+def _get_compressed(key: tuple) -> Optional[Tuple[bytes, int]]:
+    with _compress_lock:
+        entry = _compressed_cache.get(key)
+        if entry is not None:
+            _compressed_cache.move_to_end(key)
+        return entry
+
+
+def _put_compressed(key: tuple, data: bytes, raw_size: int):
+    """Cache a response body, evicting least recently used entries."""
+    global _compressed_cache_bytes
+    if len(data) > COMPRESS_CACHE_MAX_BYTES:
+        return
+    with _compress_lock:
+        if key in _compressed_cache:
+            return
+        _compressed_cache[key] = (data, raw_size)
+        _compressed_cache_bytes += len(data)
+        while _compressed_cache_bytes > COMPRESS_CACHE_MAX_BYTES:
+            _, (evicted, _) = _compressed_cache.popitem(last=False)
+            _compressed_cache_bytes -= len(evicted)
+
+
+def _etag_for(base_etag: str, encoding: str) -> str:
+    """Strong validators must differ per content encoding."""
+    return base_etag if encoding == "identity" else f"{base_etag}-{encoding}"
+
+
+def _record_compression(route: str, encoding: str, bytes_in: int, bytes_out: int,
+                        cpu_seconds: float, cache_hit: bool = False):
+    """Accumulate per-route compression ratio and CPU time."""
+    with _compress_lock:
+        st = _compression_stats.setdefault(route, {
+            "responses": 0, "cache_hits": 0, "bytes_in": 0, "bytes_out": 0,
+            "cpu_seconds": 0.0, "encodings": {},
+        })
+        st["responses"] += 1
+        st["cache_hits"] += int(cache_hit)
+        st["bytes_in"] += bytes_in
+        st["bytes_out"] += bytes_out
+        st["cpu_seconds"] += cpu_seconds
+        st["encodings"][encoding] = st["encodings"].get(encoding, 0) + 1
+
+
+def compression_stats() -> dict:
+    """Per-route compression counters for health reporting."""
+    with _compress_lock:
+        routes = {
+            route: dict(
+                st,
+                encodings=dict(st["encodings"]),
+                cpu_seconds=round(st["cpu_seconds"], 4),
+                ratio=round(st["bytes_out"] / st["bytes_in"], 3) if st["bytes_in"] else None,
+            )
+            for route, st in _compression_stats.items()
+        }
+        return {
+            "encodings": _COMPRESS_ENCODINGS,
+            "cache_entries": len(_compressed_cache),
+            "cache_bytes": _compressed_cache_bytes,
+            "routes": routes,
+        }
 
 
-def parse_rmf_file(filepath: str) -> Tuple[List[RMFRecord], Optional[str]]:
+def _compress_stream(chunks, encoding: str, route: str, cache_key: Optional[tuple] = None):
     """
-    Parse a single RMF Workload Activity report file.
-    Returns (records, error_message).
+    Compress a streamed body chunk by chunk, recording stats at the end.
+    With cache_key, the output is also cached once the stream completes.
     """
-    records: List[RMFRecord] = []
-    filename = os.path.basename(filepath)
-    
-    # File size check
-    try:
-        file_size = os.path.getsize(filepath)
-        if file_size > MAX_FILE_SIZE:
-            return [], f"File too large: {file_size / 1024 / 1024:.1f}MB (max {MAX_FILE_SIZE / 1024 / 1024:.0f}MB)"
-        if file_size == 0:
-            return [], "File is empty"
-    except OSError as e:
-        return [], f"Cannot access file: {str(e)}"
-
-    current_ts_display = None
-    current_ts_iso = None
-    current_workload = None
-    current_svc_class = None
-    current_period = None
-    awaiting_data = False
-    skip_class = False
-    line_count = 0
-
-    try:
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                line_count += 1
-                
-                # Fast path: check for START marker before regex
-                if START_MARKER in line:
-                    m = RE_TIMESTAMP.search(line)
-                    if m:
-                        date_part, time_part = m.group(1), m.group(2)
-                        current_ts_display = f"{date_part} {time_part}"
-                        try:
-                            dt = datetime.strptime(
-                                f"{date_part}-{time_part}", "%m/%d/%Y-%H.%M.%S"
-                            )
-                            current_ts_iso = dt.isoformat()
-                        except ValueError:
-                            current_ts_iso = current_ts_display
-                        continue
-
-                # Fast path: check for WORKLOAD marker before regex
-                if WORKLOAD_MARKER in line:
-                    m = RE_SERVICE_CLASS.search(line)
-                    if m:
-                        current_workload = m.group(1)
-                        current_svc_class = m.group(2)
-                        current_period = int(m.group(3))
-                        awaiting_data = True
-                        skip_class = False
-                        continue
-
-                # Check for ALL DATA ZERO
-                if awaiting_data and ALL_DATA_ZERO_MARKER in line:
-                    if RE_ALL_DATA_ZERO.search(line):
-                        skip_class = True
-                        awaiting_data = False
-                        continue
-
-                # Check for TOTAL line - fast path with AVG marker
-                if awaiting_data and not skip_class and AVG_MARKER in line:
-                    m = RE_TOTAL_LINE.match(line)
-                    if m:
-                        try:
-                            appl_cp = float(m.group(1))
-                            records.append(RMFRecord(
-                                timestamp=current_ts_display,
-                                datetime_iso=current_ts_iso,
-                                service_class=current_svc_class,
-                                workload=current_workload,
-                                period=current_period,
-                                appl_cp_total=appl_cp,
-                                file_source=filename,
-                            ))
-                        except ValueError:
-                            pass  # Skip invalid numbers
-                        awaiting_data = False
-                        continue
-
-    except UnicodeDecodeError as e:
-        return [], f"File encoding error at line {line_count}: {str(e)}"
-    except Exception as e:
-        return [], f"Parse error at line {line_count}: {str(e)}"
-
-    return records, None
-
-
-def _parse_single_file(args: Tuple[str, str]) -> Tuple[str, List[RMFRecord], Optional[str]]:
-    """Wrapper for parallel parsing - returns (filepath, records, error)."""
-    filepath, file_hash = args
-    
-    # Check cache first
-    if file_hash:
-        cached = _get_cached_parse(file_hash)
-        if cached is not None:
-            logging.info(f"Cache hit for {os.path.basename(filepath)}")
-            return filepath, cached, None
-    
-    records, error = parse_rmf_file(filepath)
-    
-    # Cache the result
-    if file_hash and error is None:
-        _set_cached_parse(file_hash, records)
-    
-    return filepath, records, error
-
-
-# Simple in-memory cache for parsed results
-_parse_cache: Dict[str, Tuple[List[RMFRecord], float]] = {}
-
+    compress, flush = _new_compressor(encoding)
+    bytes_in = bytes_out = 0
+    cpu = 0.0
+    parts = [] if cache_key else None
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        bytes_in += len(chunk)
+        t0 = time.thread_time()
+        out = compress(chunk)
+        cpu += time.thread_time() - t0
+        if out:
+            bytes_out += len(out)
+            if parts is not None:
+                parts.append(out)
+                if bytes_out > COMPRESS_CACHE_MAX_BYTES:
+                    parts = None  # Too large to cache
+            yield out
+    t0 = time.thread_time()
+    out = flush()
+    cpu += time.thread_time() - t0
+    bytes_out += len(out)
+    yield out
+    _record_compression(route, encoding, bytes_in, bytes_out, cpu)
+    if parts is not None:
+        parts.append(out)
+        _put_compressed(cache_key, b"".join(parts), bytes_in)
+
+
+def _cache_stream(chunks, cache_key: tuple):
+    """Pass an uncompressed stream through, caching it once it completes."""
+    parts = []
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        if parts is not None:
+            parts.append(chunk)
+            if size > COMPRESS_CACHE_MAX_BYTES:
+                parts = None  # Too large to cache
+        yield chunk
+    if parts is not None:
+        _put_compressed(cache_key, b"".join(parts), size)
 
-def _get_cached_parse(file_hash: str) -> Optional[List[RMFRecord]]:
-    """Get cached parse result if not expired."""
-    global _cache_hits, _cache_misses
-    if file_hash in _parse_cache:
-        records, timestamp = _parse_cache[file_hash]
-        if time.time() - timestamp < CACHE_TTL_SECONDS:
-            _cache_hits += 1
-            return records
-        else:
-            del _parse_cache[file_hash]
-    _cache_misses += 1
-    return None
-
-
-def _set_cached_parse(file_hash: str, records: List[RMFRecord]):
-    """Cache parse result with timestamp."""
-    _parse_cache[file_hash] = (records, time.time())
-
-
-def parse_all_files(directory: str, pattern: str = "RMFW*.txt") -> Tuple[List[RMFRecord], dict]:
-    """
-    Parse all matching RMF files in a directory using parallel processing.
-    """
-    files = sorted(glob.glob(os.path.join(directory, pattern)))
-    all_records: List[RMFRecord] = []
-    errors: List[str] = []
-    t0 = time.time()
-    
-    # Prepare file hash cache keys
-    file_args = []
-    for fp in files:
-        file_hash = _get_file_hash(fp)
-        file_args.append((fp, file_hash))
-    
-    # Use ThreadPoolExecutor for parallel parsing
-    if len(files) > 1:
-        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(files))) as executor:
-            futures = {executor.submit(_parse_single_file, arg): arg[0] for arg in file_args}
-            
-            for future in as_completed(futures):
-                filepath = futures[future]
-                filename = os.path.basename(filepath)
-                try:
-                    _, records, error = future.result()
-                    if error:
-                        errors.append(f"{filename}: {error}")
-                        logging.warning(f"Error parsing {filename}: {error}")
-                    else:
-                        all_records.extend(records)
-                        logging.info(f"Parsed {filename} -> {len(records)} records")
-                except Exception as e:
-                    errors.append(f"{filename}: {str(e)}")
-                    logging.error(f"Exception parsing {filename}: {e}")
-    else:
-        # Single file - parse directly
-        for filepath, file_hash in file_args:
-            filename = os.path.basename(filepath)
-            _, records, error = _parse_single_file((filepath, file_hash))
-            if error:
-                errors.append(f"{filename}: {error}")
-            else:
-                all_records.extend(records)
-                logging.info(f"Parsed {filename} -> {len(records)} records")
-
-    elapsed = time.time() - t0
-    stats = {
-        "files_parsed": len(files),
-        "files_success": len(files) - len(errors),
-        "files_failed": len(errors),
-        "file_names": [os.path.basename(f) for f in files],
-        "total_records": len(all_records),
-        "parse_time_seconds": round(elapsed, 3),
-        "errors": errors if errors else None,
-    }
-    logging.info(f"Total: {stats['total_records']} records from {stats['files_parsed']} files in {elapsed:.2f}s")
-    return all_records, stats
 
 # ---------------------------------------------------------------------------
 # Flask Application
@@ -313,6 +224,7 @@ def parse_all_files(directory: str, pattern: str = "RMFW*.txt") -> Tuple[List[RM
 app = Flask(__name__)
 DATA_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_FOLDER = os.path.join(DATA_DIR, 'uploads')
+SEGMENT_FOLDER = os.path.join(DATA_DIR, 'segments')
 ALLOWED_EXTENSIONS = {'txt', 'rmf'}
 
 # Create upload folder
@@ -322,8 +234,8 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 
-# Global cache
-ALL_RECORDS: List[RMFRecord] = []
+# Parsed records live in on-disk segments; only hot segments stay in memory
+STORE = SegmentStore(SEGMENT_FOLDER)
 PARSE_STATS: dict = {}
 _METADATA_CACHE = None
 _METADATA_CACHE_TIME = 0
@@ -371,14 +283,15 @@ def clear_uploads():
                 os.unlink(file_path)
         except Exception as e:
             logging.error(f"Error deleting {file_path}: {e}")
-    # Clear parse cache when uploads are cleared
-    _parse_cache.clear()
+    # Clear parse cache and segments when uploads are cleared
+    clear_parse_cache()
+    STORE.clear()
 
 
 def init_data():
-    """Initialize data from uploaded files."""
-    global ALL_RECORDS, PARSE_STATS, _METADATA_CACHE
-    ALL_RECORDS, PARSE_STATS = parse_all_files(UPLOAD_FOLDER)
+    """Initialize data from uploaded files, parsing only those without a segment."""
+    global PARSE_STATS, _METADATA_CACHE
+    PARSE_STATS = STORE.sync_directory(UPLOAD_FOLDER)
     _METADATA_CACHE = None  # Invalidate metadata cache
 
 
@@ -406,7 +319,7 @@ def too_large(error):
 
 
 # ---------------------------------------------------------------------------
-# After-Request Handlers (logging, CORS)
+# After-Request Handlers (logging, CORS, compression)
 # ---------------------------------------------------------------------------
 
 @app.before_request
@@ -424,6 +337,56 @@ def _add_cors_headers(response):
     return response
 
 
+@app.after_request
+def _compress_response(response):
+    """
+    Compress eligible responses using the best encoding the client accepts.
+    Streamed responses are compressed chunk by chunk as they are sent.
+    Buffered bodies are cached by (encoding, body hash) so the same payload
+    is only compressed once; /api/data bypasses this via its own
+    generation-keyed cache (see _dataset_response).
+    """
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(_COMPRESS_ENCODINGS)
+    if not encoding:
+        return response
+    route = request.url_rule.rule if request.url_rule else request.path
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding, route)
+        response.headers.pop("Content-Length", None)
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+
+    key = (encoding, hashlib.md5(body).hexdigest())
+    cached = _get_compressed(key)
+    if cached is not None:
+        data = cached[0]
+        _record_compression(route, encoding, len(body), len(data), 0.0, cache_hit=True)
+    else:
+        t0 = time.thread_time()
+        data = _compress_bytes(body, encoding)
+        _record_compression(route, encoding, len(body), len(data), time.thread_time() - t0)
+        _put_compressed(key, data, len(body))
+    response.set_data(data)
+
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(_etag_for(etag, encoding), weak)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
 @app.after_request
 def _log_request(response):
     """Log each request with method, path, status, and response time."""
@@ -443,26 +406,21 @@ def _log_request(response):
 @app.route("/api/health")
 def api_health():
     """Health check endpoint for monitoring."""
-    total = _cache_hits + _cache_misses
     return jsonify({
         "status": "ok",
-        "records_loaded": len(ALL_RECORDS),
+        "records_loaded": STORE.total_records,
         "files_loaded": PARSE_STATS.get("files_parsed", 0),
         "uptime_seconds": round(time.time() - _START_TIME, 1),
-        "cache": {
-            "ttl_seconds": CACHE_TTL_SECONDS,
-            "entries": len(_parse_cache),
-            "hits": _cache_hits,
-            "misses": _cache_misses,
-            "hit_rate": round(_cache_hits / total, 3) if total > 0 else 0,
-        },
+        "cache": cache_stats(),
+        "segments": STORE.stats(),
+        "compression": compression_stats(),
     })
 
 
 @app.route("/api/upload", methods=["POST"])
 def api_upload():
     """Handle file uploads and parse them."""
-    global ALL_RECORDS, PARSE_STATS, _METADATA_CACHE
+    global PARSE_STATS, _METADATA_CACHE
 
     # Rate limit check
     client_ip = request.remote_addr or "unknown"
@@ -483,7 +441,6 @@ def api_upload():
     clear_first = request.form.get('clear_existing', 'false').lower() == 'true'
     if clear_first:
         clear_uploads()
-        ALL_RECORDS = []
     
     uploaded_files = []
     errors = []
@@ -546,9 +503,9 @@ def api_upload():
             "details": errors
         }), 400
     
-    # Re-parse all files in upload folder
+    # Parse new files in upload folder into segments
     try:
-        ALL_RECORDS, PARSE_STATS = parse_all_files(UPLOAD_FOLDER)
+        PARSE_STATS = STORE.sync_directory(UPLOAD_FOLDER)
         _METADATA_CACHE = None  # Invalidate cache
     except Exception as e:
         logging.error(f"Parse error: {e}")
@@ -561,7 +518,9 @@ def api_upload():
         "success": True,
         "uploaded_files": uploaded_files,
         "errors": errors if errors else None,
-        "total_records": len(ALL_RECORDS),
+        "total_records": STORE.total_records,
+        "epoch": STORE.epoch,
+        "generation": STORE.generation,
         "files_parsed": PARSE_STATS.get('files_parsed', 0),
         "parse_time_seconds": PARSE_STATS.get('parse_time_seconds', 0),
     })
@@ -591,10 +550,9 @@ def api_files():
 @app.route("/api/files/clear", methods=["POST"])
 def api_clear_files():
     """Clear all uploaded files."""
-    global ALL_RECORDS, PARSE_STATS, _METADATA_CACHE
+    global PARSE_STATS, _METADATA_CACHE
     try:
         clear_uploads()
-        ALL_RECORDS = []
         PARSE_STATS = {"files_parsed": 0, "total_records": 0}
         _METADATA_CACHE = None
         return jsonify({"success": True, "message": "All files cleared"})
@@ -620,22 +578,9 @@ def api_metadata():
         return jsonify(_METADATA_CACHE)
     
     try:
-        workloads = sorted(set(r.workload for r in ALL_RECORDS))
-        service_classes = sorted(set(r.service_class for r in ALL_RECORDS))
-        dates = sorted(set(r.datetime_iso for r in ALL_RECORDS if r.datetime_iso))
-        file_sources = sorted(set(r.file_source for r in ALL_RECORDS))
-        
-        result = {
-            "workloads": workloads,
-            "service_classes": service_classes,
-            "file_sources": file_sources,
-            "date_range": {
-                "min": dates[0] if dates else None,
-                "max": dates[-1] if dates else None,
-            },
-            "total_records": len(ALL_RECORDS),
-            "parse_stats": PARSE_STATS,
-        }
+        # Zone maps carry everything needed; no segment is read here
+        result = STORE.metadata()
+        result["parse_stats"] = PARSE_STATS
         
         # Cache the result
         _METADATA_CACHE = result
@@ -647,24 +592,128 @@ def api_metadata():
         return jsonify({"error": f"Failed to generate metadata: {str(e)}"}), 500
 
 
-def _apply_filters(records: List[RMFRecord]) -> List[RMFRecord]:
-    """Apply query-string filters to records in a single pass."""
-    wl = request.args.get("workload")
-    sc = request.args.get("service_class")
-    src = request.args.get("file_source")
-    start = request.args.get("start_date")
-    end = request.args.get("end_date")
+def _filter_args() -> dict:
+    """Read the shared query-string filters."""
+    return {
+        "workload": request.args.get("workload"),
+        "service_class": request.args.get("service_class"),
+        "file_source": request.args.get("file_source"),
+        "start": request.args.get("start_date"),
+        "end": request.args.get("end_date"),
+    }
+
+
+def _record_payload(record_id: str, record: RMFRecord) -> dict:
+    """Record as JSON with its stable id, used by /api/data and delta sync."""
+    payload = record.to_dict()
+    payload["id"] = record_id
+    return payload
+
+
+def _etag_matches(base_etag: str) -> bool:
+    """True if If-None-Match names base_etag under any content encoding."""
+    inm = request.if_none_match
+    if inm.star_tag:
+        return True
+    return any(tag.split("-", 1)[0] == base_etag for tag in inm.as_set(include_weak=True))
+
+
+def _json_chunks(obj):
+    """Encode obj as jsonify would, yielding bytes of about COMPRESS_CHUNK_SIZE."""
+    provider = app.json
+    if provider.compact is False or (provider.compact is None and app.debug):
+        layout = {"indent": 2}
+    else:
+        layout = {"separators": (",", ":")}
+    encoder = json.JSONEncoder(default=provider.default, ensure_ascii=provider.ensure_ascii,
+                               sort_keys=provider.sort_keys, **layout)
+    buf = []
+    size = 0
+    for piece in encoder.iterencode(obj):
+        buf.append(piece)
+        size += len(piece)
+        if size >= COMPRESS_CHUNK_SIZE:
+            yield "".join(buf).encode("utf-8")
+            buf = []
+            size = 0
+    buf.append("\n")
+    yield "".join(buf).encode("utf-8")
+
+
+def _dataset_response(build_payload):
+    """
+    Serve a JSON body that depends only on the request URL and the dataset.
+    Identity and compressed bodies are cached under (route, query string,
+    store epoch, generation, encoding), so repeat requests against an
+    unchanged dataset skip filtering, serialization and compression. The
+    ETag is derived from the same key and suffixed per content encoding.
+    build_payload(epoch, generation) is only called on a cache miss; bodies
+    over COMPRESS_STREAM_THRESHOLD are then encoded, compressed and sent in
+    chunks, and cached once the stream completes.
+    """
+    epoch, generation = STORE.epoch, STORE.generation
+    key = (request.path, request.query_string, epoch, generation)
+    base_etag = hashlib.md5(repr(key).encode()).hexdigest()
+    encoding = request.accept_encodings.best_match(_COMPRESS_ENCODINGS) or "identity"
+    identity = _get_compressed(key + ("identity",))
+    if identity is not None and identity[1] < COMPRESS_MIN_SIZE:
+        encoding = "identity"  # Too small to compress
+
+    if _etag_matches(base_etag):
+        # A 304 carries the validator and Vary the 200 would have sent
+        response = app.response_class(status=304)
+        response.vary.add("Accept-Encoding")
+        response.set_etag(_etag_for(base_etag, encoding))
+        return response
+
+    route = request.url_rule.rule
+    cached = _get_compressed(key + (encoding,))
+    if cached is not None:
+        data, raw_size = cached
+        if encoding != "identity":
+            _record_compression(route, encoding, raw_size, len(data), 0.0, cache_hit=True)
+    else:
+        if identity is not None:
+            body = identity[0]
+        else:
+            chunks = _json_chunks(build_payload(epoch, generation))
+            head = []
+            size = 0
+            for chunk in chunks:
+                head.append(chunk)
+                size += len(chunk)
+                if size > COMPRESS_STREAM_THRESHOLD:
+                    break
+            else:
+                chunks = None
+            if chunks is not None:
+                stream = chain(head, chunks)
+                if encoding == "identity":
+                    data = _cache_stream(stream, key + ("identity",))
+                else:
+                    data = _compress_stream(stream, encoding, route, cache_key=key + (encoding,))
+                return _dataset_headers(app.response_class(data, mimetype="application/json"),
+                                        base_etag, encoding)
+            body = b"".join(head)
+            _put_compressed(key + ("identity",), body, len(body))
+        if encoding != "identity" and len(body) >= COMPRESS_MIN_SIZE:
+            t0 = time.thread_time()
+            data = _compress_bytes(body, encoding)
+            _record_compression(route, encoding, len(body), len(data), time.thread_time() - t0)
+            _put_compressed(key + (encoding,), data, len(body))
+        else:
+            encoding, data = "identity", body
+
+    return _dataset_headers(app.response_class(data, mimetype="application/json"),
+                            base_etag, encoding)
 
-    # Short-circuit: no filters active
-    if not any((wl, sc, src, start, end)):
-        return records
 
-    return [r for r in records if
-            (not wl or r.workload == wl) and
-            (not sc or r.service_class == sc) and
-            (not src or r.file_source == src) and
-            (not start or (r.datetime_iso and r.datetime_iso >= start)) and
-            (not end or (r.datetime_iso and r.datetime_iso <= end))]
+def _dataset_headers(response, base_etag: str, encoding: str):
+    response.vary.add("Accept-Encoding")
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+    response.set_etag(_etag_for(base_etag, encoding))
+    return response
 
 
 @app.route("/api/data")
@@ -678,65 +727,107 @@ def api_data():
         )
         if error:
             return jsonify({"error": error}), 400
-        
-        # Apply filters
-        filtered = _apply_filters(ALL_RECORDS)
-        total_filtered = len(filtered)
-        
-        # Apply pagination
-        if offset:
-            filtered = filtered[offset:]
-        if limit:
-            filtered = filtered[:limit]
-        
-        payload = {
-            "data": [r.to_dict() for r in filtered],
-            "count": len(filtered),
-            "total": len(ALL_RECORDS),
-            "total_filtered": total_filtered,
-            "pagination": {
-                "limit": limit,
-                "offset": offset or 0,
-            } if limit or offset else None,
-        }
 
-        # ETag support - hash the response to avoid resending unchanged data
-        response = jsonify(payload)
-        etag = hashlib.md5(response.get_data()).hexdigest()
-        response.headers["ETag"] = etag
-        if request.headers.get("If-None-Match") == etag:
-            return "", 304
-        return response
+        def build_payload(epoch, generation):
+            # Apply filters and pagination segment by segment.
+            # Generation is read first so /api/data/changes never misses records.
+            total = STORE.total_records
+            total_filtered, filtered = STORE.page_ids(offset, limit, **_filter_args())
+
+            return {
+                "data": [_record_payload(rid, r) for rid, r in filtered],
+                "count": len(filtered),
+                "epoch": epoch,
+                "generation": generation,
+                "total": total,
+                "total_filtered": total_filtered,
+                "pagination": {
+                    "limit": limit,
+                    "offset": offset or 0,
+                } if limit or offset else None,
+            }
+
+        # ETag support - unchanged dataset and query means an unchanged body
+        return _dataset_response(build_payload)
     except Exception as e:
         logging.error(f"Data API error: {e}")
         return jsonify({"error": f"Failed to fetch data: {str(e)}"}), 500
 
 
+@app.route("/api/data/changes")
+def api_data_changes():
+    """
+    Return records added and record ids retired since a dataset generation.
+    Both `since` and `epoch` come from the last /api/data or changes
+    response. Clients apply "retired" before "added", then poll again with
+    the returned epoch and generation. When "reset" is true (for example the
+    store was rebuilt under a new epoch) the delta cannot be computed and
+    the client must reload /api/data.
+    """
+    since = request.args.get("since")
+    epoch = request.args.get("epoch")
+    try:
+        since = int(since)
+        if since < 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        return jsonify({"error": "since must be a non-negative integer generation"}), 400
+    if not epoch:
+        return jsonify({"error": "epoch is required alongside since"}), 400
+
+    try:
+        delta = STORE.changes(since, epoch, **_filter_args())
+        added = [_record_payload(rid, r) for rid, r in delta["added"]]
+        return jsonify({
+            "since": since,
+            "epoch": delta["epoch"],
+            "generation": delta["generation"],
+            "reset": delta["reset"],
+            "added": added,
+            "retired": delta["retired"],
+            "count_added": len(added),
+            "count_retired": len(delta["retired"]),
+        })
+    except Exception as e:
+        logging.error(f"Changes API error: {e}")
+        return jsonify({"error": f"Failed to fetch changes: {str(e)}"}), 500
+
+
 @app.route("/api/export/csv")
 def api_export_csv():
-    """Export filtered data as a downloadable CSV."""
+    """Export filtered data as a downloadable CSV, streamed segment by segment."""
     try:
-        filtered = _apply_filters(ALL_RECORDS)
-
-        buf = io.StringIO()
-        writer = csv.writer(buf)
-        writer.writerow([
-            "DATE-TIME", "SERVICE CLASS", "WORKLOAD",
-            "PERIOD", "APPL % CP", "SOURCE FILE",
-        ])
-        for r in filtered:
-            writer.writerow([
-                r.timestamp, r.service_class, r.workload,
-                r.period, r.appl_cp_total, r.file_source,
-            ])
-
-        output = io.BytesIO(buf.getvalue().encode("utf-8"))
+        # Check matching segments before streaming, so a corrupt segment is
+        # reported here instead of truncating a 200 response mid-body
+        filters = _filter_args()
+        zones = STORE.check_segments(**filters)
+
+        def generate():
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(CSV_HEADER)
+            n = 0
+            try:
+                for _, batch in STORE.read_segments(zones):
+                    for i in match_indices(batch, **filters):
+                        writer.writerow(batch[i].to_csv_row())
+                        n += 1
+                        if n % 1000 == 0:
+                            yield buf.getvalue().encode("utf-8")
+                            buf.seek(0)
+                            buf.truncate()
+            except Exception as e:
+                # Headers are already sent; abort so the client sees an
+                # incomplete transfer rather than a short but valid file
+                logging.error(f"Export aborted after {n} rows: {e}")
+                raise
+            yield buf.getvalue().encode("utf-8")
+
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        return send_file(
-            output,
+        return Response(
+            stream_with_context(generate()),
             mimetype="text/csv",
-            as_attachment=True,
-            download_name=f"rmf_report_{ts}.csv",
+            headers={"Content-Disposition": f"attachment; filename=rmf_report_{ts}.csv"},
         )
     except Exception as e:
         logging.error(f"Export error: {e}")
@@ -0,0 +1,109 @@
+"""
+Parser micro-benchmark.
+
+Generates a synthetic RMF Workload Activity report and times parse_rmf_file
+on it, both as returned and with every record materialized as an RMFRecord.
+Timestamp conversion is also timed against a per-record strptime reference.
+The timestamp memo is cleared before every timed run so repeats stay cold.
+
+    python bench_parse.py [--intervals 96] [--repeat 5]
+"""
+
+import os
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime
+
+from rmf_parser import _iso_timestamp, parse_rmf_file
+
+WORKLOADS = {
+    "BATCH": ["BATCHHI", "BATCHMD", "BATCHLO", "BATCHDEF"],
+    "ONLINE": ["CICSHI", "CICSMD", "CICSLO", "IMSPROD", "IMSTEST"],
+    "DB2": ["DB2HI", "DB2STP", "DB2DIST"],
+    "SYSTEM": ["SYSSTC", "SYSTEM", "SYSOTHER", "STCHI", "STCLO"],
+}
+
+
+def write_report(path: str, intervals: int, seed: int = 1):
+    """Write a report with one block per service class period per interval."""
+    rnd = random.Random(seed)
+    with open(path, "w") as f:
+        for n in range(intervals):
+            h, m = divmod(n * 15, 60)
+            f.write("1                                        W O R K L O A D   A C T I V I T Y\n")
+            f.write(f"                     START 02/01/2024-{h % 24:02d}.{m:02d}.00 INTERVAL 000.15.00\n")
+            for wl, classes in WORKLOADS.items():
+                for sc in classes:
+                    for period in (1, 2, 3):
+                        f.write(f" REPORT BY: POLICY=WLMPOL   WORKLOAD={wl}     SERVICE CLASS={sc}"
+                                f"   RESOURCE GROUP=*NONE     PERIOD={period} IMPORTANCE=2\n")
+                        f.write("  TRANSACTIONS  TRANS-TIME HHH.MM.SS.TTT  --DASD I/O--  ---SERVICE---\n")
+                        if rnd.random() < 0.1:
+                            f.write("   ALL DATA ZERO\n")
+                            continue
+                        f.write("  MPL      12.34  EXECUTION    1.234  RESP     0.5  CPU  5678  SRB   1.234\n")
+                        f.write(f"  AVG      12.34  ACTUAL  1.234  SSCHRT  12.3  TOTAL {rnd.random() * 100:.2f}\n")
+
+
+def iso_reference(timestamps):
+    """Per-record conversion, as the parser did before bulk conversion."""
+    out = []
+    for ts in timestamps:
+        try:
+            out.append(datetime.strptime(ts, "%m/%d/%Y %H.%M.%S").isoformat())
+        except ValueError:
+            out.append(ts)
+    return out
+
+
+def iso_bulk(timestamps):
+    """Convert each distinct interval once, then map records to it."""
+    iso = {ts: _iso_timestamp(*ts.split(" ", 1)) for ts in set(timestamps)}
+    return [iso[ts] for ts in timestamps]
+
+
+def bench(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        _iso_timestamp.cache_clear()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--intervals", type=int, default=96 * 7, help="intervals in the report")
+    parser.add_argument("--repeat", type=int, default=5, help="best-of repetitions")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "RMFWBENCH.txt")
+        write_report(path, args.intervals)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        records, error = parse_rmf_file(path)
+        if error:
+            raise SystemExit(error)
+
+        parse_only = bench(lambda: parse_rmf_file(path), args.repeat)
+        materialized = bench(lambda: list(parse_rmf_file(path)[0]), args.repeat)
+
+    timestamps = list(records.timestamp)
+    if iso_bulk(timestamps) != iso_reference(timestamps):
+        raise SystemExit("bulk timestamp conversion differs from strptime")
+    iso_ref = bench(lambda: iso_reference(timestamps), args.repeat)
+    iso_new = bench(lambda: iso_bulk(timestamps), args.repeat)
+
+    n = len(records)
+    print(f"report:       {size_mb:.1f}MB, {args.intervals} intervals, {n} records")
+    print(f"parse:        {parse_only * 1000:8.1f} ms  {n / parse_only:12,.0f} records/s")
+    print(f"materialized: {materialized * 1000:8.1f} ms  {n / materialized:12,.0f} records/s")
+    print(f"timestamps:   {iso_new * 1000:8.1f} ms  vs {iso_ref * 1000:.1f} ms per-record strptime"
+          f" ({iso_ref / iso_new:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Headless command-line interface for bulk RMF report processing.
+
+    python rmf_cli.py parse  REPORTS... [-o out.jsonl]
+    python rmf_cli.py export REPORTS... --format csv|rmfb [-o out]
+    python rmf_cli.py stats  REPORTS... [--by workload|service_class] [--json]
+    python rmf_cli.py ingest DIRECTORY --store SEGMENT_DIR
+    python rmf_cli.py serve  [--host H] [--port P]
+
+REPORTS may be files or directories (globbed with --pattern). Results are
+streamed file by file, so memory use is bounded by --workers rather than by
+the number of reports. Flask is only imported by the `serve` subcommand.
+Exit status is 1 if any report failed to parse, 0 otherwise.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+from contextlib import contextmanager
+from typing import Dict, List
+
+from rmf_parser import (
+    CSV_HEADER,
+    DEFAULT_PATTERN,
+    MAX_WORKERS,
+    RecordBatch,
+    find_report_files,
+    iter_parse_files,
+)
+
+
+@contextmanager
+def _open_output(path: str, binary: bool = False):
+    """Open `path` for writing, or yield stdout when path is '-'."""
+    if path == "-":
+        stream = sys.stdout.buffer if binary else sys.stdout
+        try:
+            yield stream
+        finally:
+            stream.flush()
+        return
+    if binary:
+        f = open(path, "wb")
+    else:
+        f = open(path, "w", encoding="utf-8", newline="")
+    with f:
+        yield f
+
+
+def _iter_results(args):
+    """Parse the requested reports, reporting failures on stderr."""
+    files = find_report_files(args.paths, args.pattern)
+    if not files:
+        logging.warning("No report files matched")
+    for filepath, records, error in iter_parse_files(files, args.workers, use_cache=False):
+        filename = os.path.basename(filepath)
+        if error:
+            args.failures.append(f"{filename}: {error}")
+            print(f"error: {filename}: {error}", file=sys.stderr)
+            continue
+        logging.info(f"Parsed {filename} -> {len(records)} records")
+        yield filepath, records
+
+
+def cmd_parse(args) -> None:
+    """Stream records as JSON Lines."""
+    with _open_output(args.output) as out:
+        for _, records in _iter_results(args):
+            for r in records:
+                out.write(json.dumps(r.to_dict()))
+                out.write("\n")
+
+
+def cmd_export(args) -> None:
+    """Stream records as CSV or as an RMFB binary dataset."""
+    if args.format == "rmfb":
+        from rmf_dataset import DatasetFormatError, encode_block
+        with _open_output(args.output, binary=True) as out:
+            for filepath, records in _iter_results(args):
+                if not records:
+                    continue
+                try:
+                    out.write(encode_block(records))
+                except DatasetFormatError as e:
+                    filename = os.path.basename(filepath)
+                    args.failures.append(f"{filename}: {e}")
+                    print(f"error: {filename}: {e}", file=sys.stderr)
+        return
+
+    with _open_output(args.output) as out:
+        writer = csv.writer(out)
+        writer.writerow(CSV_HEADER)
+        for _, records in _iter_results(args):
+            writer.writerows(RecordBatch.from_records(records).csv_rows())
+
+
+def cmd_stats(args) -> None:
+    """Summarize APPL% CP per group without keeping records in memory."""
+    t0 = time.time()
+    groups: Dict[str, List[float]] = {}  # key -> [count, sum, max]
+    files_ok = 0
+    total = 0
+    ts_min = ts_max = None
+
+    for _, records in _iter_results(args):
+        batch = RecordBatch.from_records(records)
+        files_ok += 1
+        total += len(batch)
+        # Work on columns directly; no per-record objects are built
+        for key, value in zip(getattr(batch, args.by), batch.appl_cp_total):
+            g = groups.get(key)
+            if g is None:
+                groups[key] = [1, value, value]
+            else:
+                g[0] += 1
+                g[1] += value
+                if value > g[2]:
+                    g[2] = value
+        stamps = [ts for ts in batch.datetime_iso if ts]
+        if stamps:
+            lo, hi = min(stamps), max(stamps)
+            if ts_min is None or lo < ts_min:
+                ts_min = lo
+            if ts_max is None or hi > ts_max:
+                ts_max = hi
+
+    summary = {
+        "files_success": files_ok,
+        "files_failed": len(args.failures),
+        "total_records": total,
+        "date_range": {"min": ts_min, "max": ts_max},
+        "parse_time_seconds": round(time.time() - t0, 3),
+        "group_by": args.by,
+        "groups": {
+            key: {
+                "records": g[0],
+                "avg_appl_cp": round(g[1] / g[0], 2),
+                "max_appl_cp": g[2],
+            }
+            for key, g in sorted(groups.items())
+        },
+    }
+
+    with _open_output(args.output) as out:
+        if args.json:
+            json.dump(summary, out, indent=2)
+            out.write("\n")
+            return
+        out.write(f"Files:   {files_ok} parsed, {len(args.failures)} failed\n")
+        out.write(f"Records: {total}\n")
+        out.write(f"Range:   {ts_min or '-'} .. {ts_max or '-'}\n")
+        out.write(f"Time:    {summary['parse_time_seconds']}s\n\n")
+        width = max([len(args.by)] + [len(k) for k in groups])
+        out.write(f"{args.by.upper():<{width}}  {'RECORDS':>8}  {'AVG %':>8}  {'MAX %':>8}\n")
+        for key, g in summary["groups"].items():
+            out.write(
+                f"{key:<{width}}  {g['records']:>8}  "
+                f"{g['avg_appl_cp']:>8.2f}  {g['max_appl_cp']:>8.2f}\n"
+            )
+
+
+def cmd_ingest(args) -> None:
+    """Sync a report directory into an on-disk segment store."""
+    from rmf_store import SegmentStore
+    store = SegmentStore(args.store)
+    stats = store.sync_directory(args.directory, args.pattern, args.workers)
+    for error in stats["errors"] or []:
+        args.failures.append(error)
+        print(f"error: {error}", file=sys.stderr)
+    seg = store.stats()
+    print(
+        f"{stats['total_records']} records in {seg['segments']} segments "
+        f"({seg['bytes_on_disk'] / 1024 / 1024:.1f}MB) "
+        f"synced in {stats['parse_time_seconds']}s"
+    )
+
+
+def cmd_serve(args) -> None:
+    """Start the web interface (imports Flask lazily)."""
+    import app as webapp
+    webapp.init_data()
+    print(f"\n  RMF Analyzer ready -> http://{args.host}:{args.port}\n")
+    webapp.app.run(debug=False, host=args.host, port=args.port)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="rmf_cli",
+        description="Parse z/OS RMF Workload Activity reports without the web server.",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="log per-file progress to stderr")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("paths", nargs="+", help="report files or directories")
+    common.add_argument("--pattern", default=DEFAULT_PATTERN,
+                        help=f"glob used inside directories (default: {DEFAULT_PATTERN})")
+    common.add_argument("-j", "--workers", type=int, default=MAX_WORKERS,
+                        help=f"parallel parse workers (default: {MAX_WORKERS})")
+    common.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+
+    p = sub.add_parser("parse", parents=[common], help="emit records as JSON Lines")
+    p.set_defaults(func=cmd_parse)
+
+    p = sub.add_parser("export", parents=[common], help="export records as CSV or RMFB")
+    p.add_argument("-f", "--format", choices=("csv", "rmfb"), default="csv")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("stats", parents=[common], help="summarize APPL%% CP per group")
+    p.add_argument("--by", choices=("workload", "service_class", "file_source"), default="workload")
+    p.add_argument("--json", action="store_true", help="emit the summary as JSON")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("ingest", help="sync reports into an on-disk segment store")
+    p.add_argument("directory", help="directory of report files")
+    p.add_argument("--store", required=True, help="segment store directory")
+    p.add_argument("--pattern", default=DEFAULT_PATTERN,
+                   help=f"report file glob (default: {DEFAULT_PATTERN})")
+    p.add_argument("-j", "--workers", type=int, default=MAX_WORKERS,
+                   help=f"parallel parse workers (default: {MAX_WORKERS})")
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser("serve", help="start the web interface")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=5001)
+    p.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        stream=sys.stderr,
+    )
+    args.failures = []
+    try:
+        args.func(args)
+    except BrokenPipeError:
+        # Downstream consumer (e.g. `head`) closed the pipe
+        sys.stderr.close()
+        return 0
+    return 1 if args.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""
+Compact binary dataset format for parsed RMF records (RMFB).
+
+A dataset is a sequence of self-contained blocks, normally one per source
+report, so writers can stream blocks as files finish parsing. Each block is
+columnar: a deduplicated string table followed by fixed-width columns.
+
+Version 2 (written by this module):
+
+    header   <4sHHII   magic, version, reserved, record count, string count
+    strings  u32[n_strings] byte lengths, then the UTF-8 bytes back to back
+    pad      zero bytes up to an 8-byte boundary (from the block start)
+    columns  u32 timestamp, u32 datetime_iso, u32 service_class,
+             u32 workload, u32 file_source (string table indexes,
+             0xFFFFFFFF for a missing value)
+    pad      zero bytes up to an 8-byte boundary
+    columns  i64 period, f64 appl_cp_total
+
+Version 1 (still readable) has no padding, a u32 period column and no
+missing-value index; its empty strings decode as None.
+
+All integers and floats are little-endian. Blocks decode to a RecordBatch,
+so no per-record objects are built until a caller asks for them. With
+copy=False the columns are views into the source buffer (e.g. an mmap),
+so only the string table is decoded up front.
+"""
+
+import sys
+import struct
+from array import array
+from collections.abc import Sequence
+from typing import BinaryIO, Iterable, Iterator, List, Tuple
+
+from rmf_parser import RMFRecord, RecordBatch
+
+MAGIC = b"RMFB"
+VERSION = 2
+READABLE_VERSIONS = (1, 2)
+
+_HEADER = struct.Struct("<4sHHII")
+HEADER_SIZE = _HEADER.size
+_STRING_COLUMNS = ("timestamp", "datetime_iso", "service_class", "workload", "file_source")
+_SWAP = sys.byteorder != "little"
+_NULL = 0xFFFFFFFF
+_ALIGN = 8
+
+
+class DatasetFormatError(ValueError):
+    """Raised when a buffer is not a valid RMFB block."""
+
+
+def _padding(size: int) -> int:
+    return -size % _ALIGN
+
+
+def _to_bytes(arr: array) -> bytes:
+    if _SWAP:
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _from_bytes(typecode: str, buf, offset: int, count: int) -> Tuple[array, int]:
+    arr = array(typecode)
+    end = offset + count * arr.itemsize
+    if end > len(buf):
+        raise DatasetFormatError("Truncated RMFB block")
+    arr.frombytes(buf[offset:end])
+    if _SWAP:
+        arr.byteswap()
+    return arr, end
+
+
+def _view(typecode: str, buf, offset: int, count: int):
+    """Like _from_bytes, but a zero-copy memoryview into buf."""
+    end = offset + count * struct.calcsize(typecode)
+    if end > len(buf):
+        raise DatasetFormatError("Truncated RMFB block")
+    return memoryview(buf)[offset:end].cast(typecode), end
+
+
+class _StringColumn(Sequence):
+    """String column resolved through the string table on access."""
+
+    __slots__ = ("_indexes", "_table")
+
+    def __init__(self, indexes, table: dict):
+        self._indexes = indexes
+        self._table = table
+
+    def __len__(self):
+        return len(self._indexes)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._table[j] for j in self._indexes[i]]
+        return self._table[self._indexes[i]]
+
+    def __iter__(self):
+        return map(self._table.__getitem__, self._indexes)
+
+
+def _intern_column(values, index: dict, strings: List[str]) -> array:
+    """Map a string column to string-table indexes, extending the table."""
+    out = array("I")
+    append = out.append
+    for v in values:
+        if v is None:
+            append(_NULL)
+            continue
+        i = index.get(v)
+        if i is None:
+            i = index[v] = len(strings)
+            strings.append(v)
+        append(i)
+    return out
+
+
+def encode_block(records: Iterable[RMFRecord]) -> bytes:
+    """Serialize records (a RecordBatch or any iterable of RMFRecord) into one block."""
+    batch = RecordBatch.from_records(records)
+    strings: List[str] = []
+    index = {}
+    columns = [_intern_column(getattr(batch, name), index, strings)
+               for name in _STRING_COLUMNS]
+    try:
+        periods = array("q", batch.period)
+    except OverflowError:
+        raise DatasetFormatError("Period does not fit in a 64-bit RMFB column")
+    values = array("d", batch.appl_cp_total)
+
+    encoded = [s.encode("utf-8") for s in strings]
+    parts = [
+        _HEADER.pack(MAGIC, VERSION, 0, len(batch), len(encoded)),
+        _to_bytes(array("I", (len(b) for b in encoded))),
+        b"".join(encoded),
+    ]
+    size = sum(len(p) for p in parts)
+    parts.append(b"\0" * _padding(size))
+    parts.extend(_to_bytes(col) for col in columns)
+    parts.append(b"\0" * _padding(4 * len(columns) * len(batch)))
+    parts.append(_to_bytes(periods))
+    parts.append(_to_bytes(values))
+    return b"".join(parts)
+
+
+def _check_indexes(col, n_strings: int, allow_null: bool):
+    """Reject string-table indexes that point outside the table."""
+    if not col or max(col) < n_strings:
+        return
+    for i in col:
+        if i >= n_strings and not (allow_null and i == _NULL):
+            raise DatasetFormatError(f"RMFB string index {i} out of range ({n_strings} strings)")
+
+
+def read_header(buf, offset: int = 0) -> Tuple[int, int, int]:
+    """Validate the block header at `offset`; returns (version, count, n_strings)."""
+    if offset + _HEADER.size > len(buf):
+        raise DatasetFormatError("Truncated RMFB header")
+    magic, version, _, count, n_strings = _HEADER.unpack_from(buf, offset)
+    if magic != MAGIC:
+        raise DatasetFormatError("Not an RMFB block")
+    if version not in READABLE_VERSIONS:
+        raise DatasetFormatError(f"Unsupported RMFB version {version}")
+    return version, count, n_strings
+
+
+def decode_block(buf, offset: int = 0, copy: bool = True) -> Tuple[RecordBatch, int]:
+    """
+    Decode one RMFB block from `buf` (bytes, bytearray, memoryview or mmap)
+    starting at `offset`. Returns (batch, offset of the next block).
+
+    With copy=False the columns reference `buf` directly instead of being
+    copied out, so `buf` must stay open for as long as the batch is used.
+    Big-endian hosts always copy, since the columns need byte-swapping.
+    """
+    read = _from_bytes if copy or _SWAP else _view
+    start = offset
+    version, count, n_strings = read_header(buf, offset)
+    offset += _HEADER.size
+
+    lengths, offset = _from_bytes("I", buf, offset, n_strings)
+    strings: List[str] = []
+    for n in lengths:
+        if offset + n > len(buf):
+            raise DatasetFormatError("Truncated RMFB string table")
+        try:
+            strings.append(bytes(buf[offset:offset + n]).decode("utf-8"))
+        except UnicodeDecodeError as e:
+            raise DatasetFormatError(f"Invalid RMFB string: {e}")
+        offset += n
+
+    if version == 1:
+        # v1 wrote missing values as empty strings
+        table = {i: (s or None) for i, s in enumerate(strings)}
+    else:
+        table = dict(enumerate(strings))
+        table[_NULL] = None
+        offset += _padding(offset - start)
+
+    cols = []
+    for _ in _STRING_COLUMNS:
+        col, offset = read("I", buf, offset, count)
+        _check_indexes(col, n_strings, allow_null=version >= 2)
+        cols.append([table[i] for i in col] if copy else _StringColumn(col, table))
+    if version == 1:
+        periods, offset = read("I", buf, offset, count)
+    else:
+        offset += _padding(offset - start)
+        periods, offset = read("q", buf, offset, count)
+    values, offset = read("d", buf, offset, count)
+
+    ts, iso, sc, wl, src = cols
+    return RecordBatch(ts, iso, sc, wl, periods, values, src), offset
+
+
+def iter_blocks(buf) -> Iterator[RecordBatch]:
+    """Yield the records of each block in a dataset buffer."""
+    offset = 0
+    while offset < len(buf):
+        records, offset = decode_block(buf, offset)
+        yield records
+
+
+def write_block(stream: BinaryIO, records: Iterable[RMFRecord]) -> int:
+    """Append one block to a binary stream; returns bytes written."""
+    data = encode_block(records)
+    stream.write(data)
+    return len(data)
+
+
+def read_dataset(path: str) -> List[RMFRecord]:
+    """Load every record from an RMFB dataset file."""
+    with open(path, "rb") as f:
+        buf = f.read()
+    records: List[RMFRecord] = []
+    for block in iter_blocks(buf):
+        records.extend(block)
+    return records
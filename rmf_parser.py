@@ -0,0 +1,451 @@
+"""
+z/OS RMF Workload Activity Report Parser
+Framework-free parsing core shared by the web app and the batch CLI.
+Importing this module has no filesystem side effects and pulls in no web framework.
+"""
+
+import re
+import os
+import glob
+import time
+import logging
+import hashlib
+from array import array
+from collections import deque
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Tuple, Optional, Dict
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB max file size
+MAX_WORKERS = 4  # Thread pool workers for parallel parsing
+CACHE_TTL_SECONDS = 300  # Parse cache TTL (5 minutes)
+DEFAULT_PATTERN = "RMFW*.txt"  # Report files picked up from a directory
+
+CSV_HEADER = (
+    "DATE-TIME", "SERVICE CLASS", "WORKLOAD",
+    "PERIOD", "APPL % CP", "SOURCE FILE",
+)
+
+# ---------------------------------------------------------------------------
+# Cache Stats
+# ---------------------------------------------------------------------------
+
+_cache_hits = 0
+_cache_misses = 0
+
+# ---------------------------------------------------------------------------
+# Data Model
+# ---------------------------------------------------------------------------
+
+@dataclass
+class RMFRecord:
+    timestamp: str        # MM/DD/YYYY HH.MM.SS
+    datetime_iso: str     # ISO format for JS
+    service_class: str
+    workload: str
+    period: int
+    appl_cp_total: float
+    file_source: str
+
+    def to_dict(self):
+        return asdict(self)
+
+    def to_csv_row(self):
+        """Row matching CSV_HEADER."""
+        return [
+            self.timestamp, self.service_class, self.workload,
+            self.period, self.appl_cp_total, self.file_source,
+        ]
+
+
+class RecordBatch(Sequence):
+    """
+    Columnar sequence of records. Each field is a parallel column (typed
+    arrays for period and appl_cp_total); RMFRecord objects are only built
+    when an element is accessed or the batch is iterated.
+    """
+
+    __slots__ = ("timestamp", "datetime_iso", "service_class", "workload",
+                 "period", "appl_cp_total", "file_source")
+
+    def __init__(self, timestamp, datetime_iso, service_class, workload,
+                 period, appl_cp_total, file_source):
+        self.timestamp = timestamp
+        self.datetime_iso = datetime_iso
+        self.service_class = service_class
+        self.workload = workload
+        self.period = period
+        self.appl_cp_total = appl_cp_total
+        self.file_source = file_source
+
+    @classmethod
+    def empty(cls) -> "RecordBatch":
+        """A batch with no records."""
+        return cls([], [], [], [], array("q"), array("d"), [])
+
+    @classmethod
+    def from_records(cls, records: Iterable[RMFRecord]) -> "RecordBatch":
+        """Wrap records column-wise; batches are returned unchanged."""
+        if isinstance(records, RecordBatch):
+            return records
+        records = list(records)
+        return cls(
+            [r.timestamp for r in records],
+            [r.datetime_iso for r in records],
+            [r.service_class for r in records],
+            [r.workload for r in records],
+            [r.period for r in records],
+            array("d", [r.appl_cp_total for r in records]),
+            [r.file_source for r in records],
+        )
+
+    def __len__(self):
+        return len(self.appl_cp_total)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return RMFRecord(
+            self.timestamp[i], self.datetime_iso[i], self.service_class[i],
+            self.workload[i], self.period[i], self.appl_cp_total[i],
+            self.file_source[i],
+        )
+
+    def __iter__(self):
+        return map(RMFRecord, self.timestamp, self.datetime_iso, self.service_class,
+                   self.workload, self.period, self.appl_cp_total, self.file_source)
+
+    def csv_rows(self) -> Iterator[tuple]:
+        """Rows matching CSV_HEADER, straight from the columns."""
+        return zip(self.timestamp, self.service_class, self.workload,
+                   self.period, self.appl_cp_total, self.file_source)
+
+# ---------------------------------------------------------------------------
+# RMF Parser (optimized state-machine approach)
+# ---------------------------------------------------------------------------
+
+# Compiled regex patterns
+RE_TIMESTAMP = re.compile(
+    r'START\s+(\d{2}/\d{2}/\d{4})-(\d{2}\.\d{2}\.\d{2})\s+INTERVAL'
+)
+RE_SERVICE_CLASS = re.compile(
+    r'WORKLOAD=(\w+)\s+SERVICE CLASS=(\w+)\s+.*?PERIOD=(\d+)'
+)
+RE_ALL_DATA_ZERO = re.compile(r'ALL DATA ZERO')
+RE_TOTAL_LINE = re.compile(
+    r'^\s*AVG\s+.*?TOTAL\s+([\d.]+)'
+)
+
+# Fast path strings for pre-filtering
+START_MARKER = "START "
+WORKLOAD_MARKER = "WORKLOAD="
+AVG_MARKER = "AVG"
+ALL_DATA_ZERO_MARKER = "ALL DATA ZERO"
+
+
+def _get_file_hash(filepath: str) -> str:
+    """Generate a hash based on file path, mtime, and size for caching."""
+    try:
+        stat = os.stat(filepath)
+        hash_input = f"{filepath}:{stat.st_mtime}:{stat.st_size}"
+        return hashlib.md5(hash_input.encode()).hexdigest()
+    except (OSError, IOError):
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _iso_timestamp(date_part: str, time_part: str) -> str:
+    """Convert one interval start to ISO format; memoized across files."""
+    try:
+        dt = datetime.strptime(f"{date_part}-{time_part}", "%m/%d/%Y-%H.%M.%S")
+        return dt.isoformat()
+    except ValueError:
+        return f"{date_part} {time_part}"
+
+
+def _bulk_floats(raw: List[str]) -> Tuple[array, Optional[List[int]]]:
+    """
+    Convert captured numbers in one pass. Returns (values, keep) where keep
+    lists the surviving positions if any value was invalid, else None.
+    """
+    try:
+        return array("d", map(float, raw)), None
+    except ValueError:
+        values = array("d")
+        keep = []
+        for i, text in enumerate(raw):
+            try:
+                values.append(float(text))
+                keep.append(i)
+            except ValueError:
+                pass  # Skip invalid numbers
+        return values, keep
+
+
+def _bulk_ints(raw: List[str]) -> Sequence:
+    """Convert captured integers in one pass; falls back to a list beyond int64."""
+    try:
+        return array("q", map(int, raw))
+    except OverflowError:
+        return list(map(int, raw))
+
+
+def parse_rmf_file(filepath: str) -> Tuple[RecordBatch, Optional[str]]:
+    """
+    Parse a single RMF Workload Activity report file.
+    Returns (records, error_message); records is a columnar RecordBatch.
+
+    The line loop only captures raw fields into per-file buffers. Numbers
+    are converted in bulk afterwards and each distinct interval timestamp
+    is converted once.
+    """
+    filename = os.path.basename(filepath)
+
+    # File size check
+    try:
+        file_size = os.path.getsize(filepath)
+        if file_size > MAX_FILE_SIZE:
+            return RecordBatch.empty(), f"File too large: {file_size / 1024 / 1024:.1f}MB (max {MAX_FILE_SIZE / 1024 / 1024:.0f}MB)"
+        if file_size == 0:
+            return RecordBatch.empty(), "File is empty"
+    except OSError as e:
+        return RecordBatch.empty(), f"Cannot access file: {str(e)}"
+
+    # Per-record raw buffers
+    ts_col: List[Optional[str]] = []
+    wl_col: List[str] = []
+    sc_col: List[str] = []
+    period_raw: List[str] = []
+    value_raw: List[str] = []
+    intervals: Dict[str, Tuple[str, str]] = {}
+
+    # Bound methods hoisted out of the loop
+    ts_search = RE_TIMESTAMP.search
+    sc_search = RE_SERVICE_CLASS.search
+    zero_search = RE_ALL_DATA_ZERO.search
+    total_match = RE_TOTAL_LINE.match
+
+    current_ts_display = None
+    current_workload = None
+    current_svc_class = None
+    current_period = None
+    awaiting_data = False
+    skip_class = False
+    line_count = 0
+
+    try:
+        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+            for line_count, line in enumerate(f, 1):
+
+                # Fast path: check for START marker before regex
+                if START_MARKER in line:
+                    m = ts_search(line)
+                    if m:
+                        parts = m.groups()
+                        current_ts_display = f"{parts[0]} {parts[1]}"
+                        intervals[current_ts_display] = parts
+                        continue
+
+                # Fast path: check for WORKLOAD marker before regex
+                if WORKLOAD_MARKER in line:
+                    m = sc_search(line)
+                    if m:
+                        current_workload, current_svc_class, current_period = m.groups()
+                        awaiting_data = True
+                        skip_class = False
+                        continue
+
+                # Check for ALL DATA ZERO
+                if awaiting_data and ALL_DATA_ZERO_MARKER in line:
+                    if zero_search(line):
+                        skip_class = True
+                        awaiting_data = False
+                        continue
+
+                # Check for TOTAL line - fast path with AVG marker
+                if awaiting_data and not skip_class and AVG_MARKER in line:
+                    m = total_match(line)
+                    if m:
+                        ts_col.append(current_ts_display)
+                        wl_col.append(current_workload)
+                        sc_col.append(current_svc_class)
+                        period_raw.append(current_period)
+                        value_raw.append(m.group(1))
+                        awaiting_data = False
+                        continue
+
+        # Bulk conversion, still guarded so bad data becomes an error string
+        values, keep = _bulk_floats(value_raw)
+        if keep is not None:
+            ts_col = [ts_col[i] for i in keep]
+            wl_col = [wl_col[i] for i in keep]
+            sc_col = [sc_col[i] for i in keep]
+            period_raw = [period_raw[i] for i in keep]
+
+        iso = {display: _iso_timestamp(*parts) for display, parts in intervals.items()}
+        iso[None] = None
+
+        batch = RecordBatch(
+            ts_col,
+            [iso[ts] for ts in ts_col],
+            sc_col,
+            wl_col,
+            _bulk_ints(period_raw),
+            values,
+            [filename] * len(values),
+        )
+
+    except UnicodeDecodeError as e:
+        return RecordBatch.empty(), f"File encoding error at line {line_count}: {str(e)}"
+    except Exception as e:
+        return RecordBatch.empty(), f"Parse error at line {line_count}: {str(e)}"
+
+    return batch, None
+
+
+def _parse_single_file(args: Tuple[str, str]) -> Tuple[str, RecordBatch, Optional[str]]:
+    """Wrapper for parallel parsing - returns (filepath, records, error)."""
+    filepath, file_hash = args
+
+    # Check cache first
+    if file_hash:
+        cached = _get_cached_parse(file_hash)
+        if cached is not None:
+            logging.info(f"Cache hit for {os.path.basename(filepath)}")
+            return filepath, cached, None
+
+    records, error = parse_rmf_file(filepath)
+
+    # Cache the result
+    if file_hash and error is None:
+        _set_cached_parse(file_hash, records)
+
+    return filepath, records, error
+
+
+# Simple in-memory cache for parsed results
+_parse_cache: Dict[str, Tuple[RecordBatch, float]] = {}
+
+
+def _get_cached_parse(file_hash: str) -> Optional[RecordBatch]:
+    """Get cached parse result if not expired."""
+    global _cache_hits, _cache_misses
+    if file_hash in _parse_cache:
+        records, timestamp = _parse_cache[file_hash]
+        if time.time() - timestamp < CACHE_TTL_SECONDS:
+            _cache_hits += 1
+            return records
+        else:
+            del _parse_cache[file_hash]
+    _cache_misses += 1
+    return None
+
+
+def _set_cached_parse(file_hash: str, records: RecordBatch):
+    """Cache parse result with timestamp."""
+    _parse_cache[file_hash] = (records, time.time())
+
+
+def clear_parse_cache():
+    """Drop all cached parse results."""
+    _parse_cache.clear()
+
+
+def cache_stats() -> dict:
+    """Return parse cache counters for health reporting."""
+    total = _cache_hits + _cache_misses
+    return {
+        "ttl_seconds": CACHE_TTL_SECONDS,
+        "entries": len(_parse_cache),
+        "hits": _cache_hits,
+        "misses": _cache_misses,
+        "hit_rate": round(_cache_hits / total, 3) if total > 0 else 0,
+    }
+
+
+def find_report_files(paths: Iterable[str], pattern: str = DEFAULT_PATTERN) -> List[str]:
+    """
+    Expand a mix of files and directories into a sorted list of report files.
+    Directories are globbed with `pattern`; explicit files are kept as given.
+    """
+    files: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, pattern))))
+        else:
+            files.append(path)
+    return files
+
+
+def iter_parse_files(files: List[str], max_workers: int = MAX_WORKERS,
+                     use_cache: bool = True) -> Iterator[Tuple[str, RecordBatch, Optional[str]]]:
+    """
+    Parse files in parallel, yielding (filepath, records, error) in input order.
+    At most 2 * max_workers results are held in memory at once, so callers can
+    stream results for thousands of files without buffering the whole set.
+    Pass use_cache=False for one-shot batch runs so results are not retained.
+    """
+    file_args = [(fp, _get_file_hash(fp) if use_cache else None) for fp in files]
+
+    if max_workers <= 1 or len(file_args) <= 1:
+        for arg in file_args:
+            yield _parse_single_file(arg)
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(file_args))) as executor:
+        pending = deque()
+        args_iter = iter(file_args)
+        for arg in args_iter:
+            pending.append((arg[0], executor.submit(_parse_single_file, arg)))
+            if len(pending) >= max_workers * 2:
+                break
+
+        while pending:
+            filepath, future = pending.popleft()
+            try:
+                yield future.result()
+            except Exception as e:
+                yield filepath, RecordBatch.empty(), str(e) or type(e).__name__
+            for arg in args_iter:
+                pending.append((arg[0], executor.submit(_parse_single_file, arg)))
+                break
+
+
+def parse_all_files(directory: str, pattern: str = DEFAULT_PATTERN,
+                    max_workers: int = MAX_WORKERS) -> Tuple[List[RMFRecord], dict]:
+    """
+    Parse all matching RMF files in a directory using parallel processing.
+    """
+    files = sorted(glob.glob(os.path.join(directory, pattern)))
+    all_records: List[RMFRecord] = []
+    errors: List[str] = []
+    t0 = time.time()
+
+    for filepath, records, error in iter_parse_files(files, max_workers):
+        filename = os.path.basename(filepath)
+        if error:
+            errors.append(f"{filename}: {error}")
+            logging.warning(f"Error parsing {filename}: {error}")
+        else:
+            all_records.extend(records)
+            logging.info(f"Parsed {filename} -> {len(records)} records")
+
+    elapsed = time.time() - t0
+    stats = {
+        "files_parsed": len(files),
+        "files_success": len(files) - len(errors),
+        "files_failed": len(errors),
+        "file_names": [os.path.basename(f) for f in files],
+        "total_records": len(all_records),
+        "parse_time_seconds": round(elapsed, 3),
+        "errors": errors if errors else None,
+    }
+    logging.info(f"Total: {stats['total_records']} records from {stats['files_parsed']} files in {elapsed:.2f}s")
+    return all_records, stats
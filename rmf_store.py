@@ -0,0 +1,559 @@
+"""
+Out-of-core segment store for parsed RMF records.
+
+Each parsed source report becomes one immutable segment on disk (a single
+RMFB block, see rmf_dataset.py) plus a zone map kept in manifest.json:
+
+    {"id", "file_source", "source_hash", "generation", "records", "bytes",
+     "ts_min", "ts_max", "workloads", "service_classes"}
+
+Every ingest that changes the store is published atomically as a new,
+monotonically increasing generation. Segments record the generation that
+added them, and retired segments leave a tombstone with the generation
+that removed them, so callers can ask for only what changed since a
+generation they already hold. Generations are only comparable within one
+store: each store gets a random epoch when it is created, and a wiped or
+unreadable manifest starts a new epoch rather than reusing old numbers.
+
+Queries consult the zone maps first and only memory-map segments that can
+contain matching records. A segment's columns are read straight out of its
+map, which stays open for as long as its RecordBatch is referenced; only
+the string table is decoded on open. Opened segments are held in a bounded
+LRU cache so hot segments are not re-opened on every request, and filters
+run on columns before any record is built. Each map holds a file
+descriptor, so the cache is bounded by segment count as well as by
+records, and scans keep at most one uncached segment open at a time.
+"""
+
+import os
+import glob
+import json
+import mmap
+import secrets
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import resource  # Unix only: used to keep mapped segments under RLIMIT_NOFILE
+except ImportError:
+    resource = None
+
+from rmf_parser import (
+    RMFRecord,
+    RecordBatch,
+    DEFAULT_PATTERN,
+    MAX_WORKERS,
+    _get_file_hash,
+    iter_parse_files,
+)
+from rmf_dataset import (
+    HEADER_SIZE,
+    DatasetFormatError,
+    decode_block,
+    encode_block,
+    read_header,
+)
+
+SEGMENT_SUFFIX = ".rmfb"
+MANIFEST_NAME = "manifest.json"
+SEGMENT_CACHE_MAX_RECORDS = 500_000  # Decoded records kept in memory
+SEGMENT_CACHE_MAX_SEGMENTS = 128  # Segments kept mapped (one fd each)
+RETIRED_HISTORY_MAX = 10_000  # Tombstones kept for delta sync
+
+
+def build_zone_map(segment_id: str, file_source: str, source_hash: str,
+                   records: Sequence[RMFRecord]) -> dict:
+    """Summarize a segment so queries can skip it without reading it."""
+    batch = RecordBatch.from_records(records)
+    stamps = [ts for ts in batch.datetime_iso if ts]
+    return {
+        "id": segment_id,
+        "file_source": file_source,
+        "source_hash": source_hash,
+        "generation": 0,  # Stamped when the segment is committed
+        "records": len(batch),
+        "bytes": 0,
+        "ts_min": min(stamps) if stamps else None,
+        "ts_max": max(stamps) if stamps else None,
+        "workloads": sorted(set(batch.workload)),
+        "service_classes": sorted(set(batch.service_class)),
+    }
+
+
+def zone_map_matches(zone: dict, workload: Optional[str] = None,
+                     service_class: Optional[str] = None,
+                     file_source: Optional[str] = None,
+                     start: Optional[str] = None,
+                     end: Optional[str] = None) -> bool:
+    """Return False if no record in the segment can satisfy the filters."""
+    if not zone["records"]:
+        return False
+    if workload and workload not in zone["workloads"]:
+        return False
+    if service_class and service_class not in zone["service_classes"]:
+        return False
+    if file_source and file_source != zone["file_source"]:
+        return False
+    if start and (zone["ts_max"] is None or zone["ts_max"] < start):
+        return False
+    if end and (zone["ts_min"] is None or zone["ts_min"] > end):
+        return False
+    return True
+
+
+def match_indices(batch: RecordBatch, workload: Optional[str] = None,
+                  service_class: Optional[str] = None,
+                  file_source: Optional[str] = None,
+                  start: Optional[str] = None,
+                  end: Optional[str] = None) -> Sequence[int]:
+    """
+    Positions in the batch matching the filters, evaluated column by column
+    without building records. Same semantics as the /api/data query string.
+    """
+    idx: Sequence[int] = range(len(batch))
+    if workload:
+        col = batch.workload
+        idx = [i for i in idx if col[i] == workload]
+    if service_class:
+        col = batch.service_class
+        idx = [i for i in idx if col[i] == service_class]
+    if file_source:
+        col = batch.file_source
+        idx = [i for i in idx if col[i] == file_source]
+    if start:
+        col = batch.datetime_iso
+        idx = [i for i in idx if col[i] and col[i] >= start]
+    if end:
+        col = batch.datetime_iso
+        idx = [i for i in idx if col[i] and col[i] <= end]
+    return idx
+
+
+class SegmentStore:
+    """Immutable on-disk segments with zone maps and an LRU read cache."""
+
+    def __init__(self, root: str, cache_max_records: int = SEGMENT_CACHE_MAX_RECORDS,
+                 cache_max_segments: int = SEGMENT_CACHE_MAX_SEGMENTS):
+        self.root = root
+        self.cache_max_records = cache_max_records
+        if resource is not None:
+            soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+            if soft != resource.RLIM_INFINITY:
+                cache_max_segments = min(cache_max_segments, max(soft // 4, 1))
+        self.cache_max_segments = cache_max_segments
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._zones: Dict[str, dict] = {}
+        self._retired: List[dict] = []  # Tombstones, oldest first
+        self.epoch = secrets.token_hex(8)  # Replaced by the manifest's epoch if one loads
+        self.generation = 0
+        self.retired_floor = 0  # Tombstones at or below this were discarded
+        self._cache: "OrderedDict[str, RecordBatch]" = OrderedDict()
+        self._cached_records = 0
+        self.segments_read = 0
+        self.segments_skipped = 0
+        self.cache_hits = 0
+        self._load_manifest()
+
+    # -- persistence -------------------------------------------------------
+
+    def _segment_path(self, segment_id: str) -> str:
+        return os.path.join(self.root, segment_id + SEGMENT_SUFFIX)
+
+    def _load_manifest(self):
+        path = os.path.join(self.root, MANIFEST_NAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable segment manifest {path}: {e}")
+            return
+        if isinstance(manifest, list):
+            # Pre-generation manifest: a bare list of zone maps
+            manifest = {"segments": manifest}
+        # Pre-epoch manifests keep the fresh epoch and persist it on next save
+        self.epoch = manifest.get("epoch", self.epoch)
+        self.generation = manifest.get("generation", 0)
+        self.retired_floor = manifest.get("retired_floor", 0)
+        self._retired = manifest.get("retired", [])
+        for zone in manifest["segments"]:
+            zone.setdefault("generation", 0)
+            if zone["records"] and not os.path.exists(self._segment_path(zone["id"])):
+                logging.warning(f"Segment {zone['id']} missing, dropping from manifest")
+                continue
+            self._zones[zone["id"]] = zone
+
+    def _save_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, MANIFEST_NAME)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "epoch": self.epoch,
+                "generation": self.generation,
+                "retired_floor": self.retired_floor,
+                "segments": list(self._zones.values()),
+                "retired": self._retired,
+            }, f)
+        os.replace(tmp, path)
+
+    def _write_segment(self, file_source: str, source_hash: str,
+                       records: Sequence[RMFRecord]) -> dict:
+        """Write records as an immutable segment file; returns its zone map."""
+        segment_id = source_hash
+        zone = build_zone_map(segment_id, file_source, source_hash, records)
+        if records:
+            os.makedirs(self.root, exist_ok=True)
+            path = self._segment_path(segment_id)
+            data = encode_block(records)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            zone["bytes"] = len(data)
+        return zone
+
+    def _commit(self, added: List[dict], retired_ids: List[str]) -> int:
+        """
+        Publish added segments and retire others as one new generation.
+        Readers see either the whole change or none of it.
+        """
+        if not added and not retired_ids:
+            return self.generation
+        with self._lock:
+            gen = self.generation + 1
+            for segment_id in retired_ids:
+                zone = self._zones.pop(segment_id, None)
+                if zone is None:
+                    continue
+                cached = self._cache.pop(segment_id, None)
+                if cached is not None:
+                    self._cached_records -= len(cached)
+                self._retired.append(dict(zone, retired_generation=gen))
+            for zone in added:
+                zone["generation"] = gen
+                self._zones[zone["id"]] = zone
+            if len(self._retired) > RETIRED_HISTORY_MAX:
+                dropped = self._retired[:-RETIRED_HISTORY_MAX]
+                self._retired = self._retired[-RETIRED_HISTORY_MAX:]
+                self.retired_floor = max(z["retired_generation"] for z in dropped)
+            self.generation = gen
+            self._save_manifest()
+        for segment_id in retired_ids:
+            try:
+                os.unlink(self._segment_path(segment_id))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # e.g. still mapped by a reader on platforms that forbid it
+                logging.warning(f"Could not remove retired segment {segment_id}: {e}")
+        return gen
+
+    def add_segment(self, file_source: str, source_hash: str,
+                    records: Sequence[RMFRecord]) -> dict:
+        """Write records as a new immutable segment and publish it."""
+        zone = self._write_segment(file_source, source_hash, records)
+        self._commit([zone], [])
+        return zone
+
+    def remove_segment(self, segment_id: str):
+        """Retire a segment: drop it from the manifest, cache and disk."""
+        self._commit([], [segment_id])
+
+    def clear(self):
+        """Retire every segment."""
+        with self._sync_lock:
+            self._commit([], list(self._zones))
+
+    # -- reads -------------------------------------------------------------
+
+    def zones(self) -> List[dict]:
+        """Snapshot of zone maps, ordered by source file name."""
+        with self._lock:
+            return sorted(self._zones.values(), key=lambda z: z["file_source"])
+
+    @property
+    def total_records(self) -> int:
+        return sum(z["records"] for z in self.zones())
+
+    def _read_segment(self, segment_id: str) -> RecordBatch:
+        with self._lock:
+            records = self._cache.get(segment_id)
+            if records is not None:
+                self._cache.move_to_end(segment_id)
+                self.cache_hits += 1
+                return records
+
+        # The map is not closed here: the batch's columns are views into it,
+        # and it is unmapped once the last of them is released.
+        with open(self._segment_path(segment_id), "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buf = b""
+        records, _ = decode_block(buf, copy=False)
+
+        with self._lock:
+            self.segments_read += 1
+            cached = self._cache.get(segment_id)
+            if cached is not None:
+                # A concurrent miss cached it first; count it only once
+                self._cache.move_to_end(segment_id)
+                return cached
+            if segment_id in self._zones and len(records) <= self.cache_max_records:
+                self._cache[segment_id] = records
+                self._cached_records += len(records)
+                while (self._cached_records > self.cache_max_records
+                       or len(self._cache) > self.cache_max_segments):
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cached_records -= len(evicted)
+        return records
+
+    def _candidate_zones(self, zones: List[dict], filters: dict) -> Iterator[dict]:
+        """Yield the zones the zone maps cannot rule out."""
+        for zone in zones:
+            if zone_map_matches(zone, **filters):
+                yield zone
+            elif zone["records"]:
+                with self._lock:
+                    self.segments_skipped += 1
+
+    def _matching_segments(self, zones: List[dict], filters: dict) -> Iterator[Tuple[dict, RecordBatch]]:
+        """Yield (zone, records) for segments the zone maps cannot rule out."""
+        for zone in self._candidate_zones(zones, filters):
+            try:
+                records = self._read_segment(zone["id"])
+            except FileNotFoundError:
+                continue  # Retired by a concurrent sync
+            yield zone, records
+
+    def scan(self, **filters) -> Iterator[RMFRecord]:
+        """
+        Yield records matching the filters (workload, service_class,
+        file_source, start, end), skipping segments ruled out by zone maps.
+        """
+        active = any(filters.values())
+        for _, batch in self._matching_segments(self.zones(), filters):
+            if not active:
+                yield from batch
+                continue
+            for i in match_indices(batch, **filters):
+                yield batch[i]
+
+    def _check_segment(self, zone: dict):
+        """Validate a segment's size and header without decoding or mapping it."""
+        with open(self._segment_path(zone["id"]), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size != zone["bytes"]:
+                raise DatasetFormatError(
+                    f"Segment {zone['id']} is {size} bytes, expected {zone['bytes']}")
+            read_header(f.read(HEADER_SIZE))
+
+    def check_segments(self, **filters) -> List[dict]:
+        """
+        Zones of the segments the filters can match, after checking each
+        one's size and header, so a damaged segment raises
+        DatasetFormatError before the caller starts producing output.
+        Nothing is left open; pass the zones to read_segments() and filter
+        the batches with match_indices().
+        """
+        checked = []
+        for zone in self._candidate_zones(self.zones(), filters):
+            with self._lock:
+                cached = zone["id"] in self._cache
+            if not cached:
+                try:
+                    self._check_segment(zone)
+                except FileNotFoundError:
+                    continue  # Retired by a concurrent sync
+            checked.append(zone)
+        return checked
+
+    def read_segments(self, zones: List[dict]) -> Iterator[Tuple[dict, RecordBatch]]:
+        """Open segments from check_segments() one at a time."""
+        return self._matching_segments(zones, {})
+
+    def _scan_ids(self, zones: List[dict], filters: dict) -> Iterator[Tuple[str, RMFRecord]]:
+        for zone, batch in self._matching_segments(zones, filters):
+            prefix = zone["id"] + ":"
+            for i in match_indices(batch, **filters):
+                yield f"{prefix}{i}", batch[i]
+
+    def scan_ids(self, **filters) -> Iterator[Tuple[str, RMFRecord]]:
+        """
+        Like scan(), but yield (record_id, record). Record ids are
+        "<segment id>:<index>" and stay valid until the segment is retired.
+        Read `generation` before scanning so a later changes() call never
+        misses records.
+        """
+        return self._scan_ids(self.zones(), filters)
+
+    def page_ids(self, offset: int = 0, limit: Optional[int] = None,
+                 **filters) -> Tuple[int, List[Tuple[str, RMFRecord]]]:
+        """
+        One page of scan_ids(): returns (total matches, [(record_id, record)]).
+        Matches are counted per segment from the columns, and records are
+        only built for the page. Without filters, segments outside the page
+        are counted from their zone maps and not read at all.
+        """
+        active = any(filters.values())
+        stop = offset + limit if limit else None
+        total = 0
+        page: List[Tuple[str, RMFRecord]] = []
+        for zone in self._candidate_zones(self.zones(), filters):
+            n = zone["records"]
+            if not active and (total + n <= offset or (stop is not None and total >= stop)):
+                total += n
+                continue
+            try:
+                batch = self._read_segment(zone["id"])
+            except FileNotFoundError:
+                continue  # Retired by a concurrent sync
+            idx = match_indices(batch, **filters)
+            lo = max(offset - total, 0)
+            hi = len(idx) if stop is None else max(stop - total, 0)
+            prefix = zone["id"] + ":"
+            page.extend((f"{prefix}{i}", batch[i]) for i in idx[lo:hi])
+            total += len(idx)
+        return total, page
+
+    def changes(self, since: int, epoch: str, **filters) -> dict:
+        """
+        Records added and record ids retired after generation `since` of
+        store `epoch`. Returns {"epoch", "generation", "reset",
+        "added": [(id, record)], "retired": [id]}; reset is True when the
+        caller's generation belongs to another epoch, is ahead of the store,
+        or needs tombstones that have been discarded. The caller must then
+        reload the full dataset instead.
+        """
+        with self._lock:
+            current_epoch = self.epoch
+            generation = self.generation
+            reset = (epoch != current_epoch or since > generation
+                     or since < self.retired_floor)
+            zones = sorted(
+                (z for z in self._zones.values() if z["generation"] > since),
+                key=lambda z: z["file_source"],
+            )
+            # Only segments the caller could have seen need a tombstone
+            retired = [z for z in self._retired
+                       if z["retired_generation"] > since and z["generation"] <= since]
+        if reset:
+            return {"epoch": current_epoch, "generation": generation,
+                    "reset": True, "added": [], "retired": []}
+        added = list(self._scan_ids(zones, filters))
+        retired_ids = [
+            f"{z['id']}:{i}"
+            for z in retired if zone_map_matches(z, **filters)
+            for i in range(z["records"])
+        ]
+        return {"epoch": current_epoch, "generation": generation,
+                "reset": False, "added": added, "retired": retired_ids}
+
+    def metadata(self) -> dict:
+        """Filter values and date range computed from zone maps alone."""
+        zones = [z for z in self.zones() if z["records"]]
+        mins = [z["ts_min"] for z in zones if z["ts_min"]]
+        maxs = [z["ts_max"] for z in zones if z["ts_max"]]
+        return {
+            "workloads": sorted(set(w for z in zones for w in z["workloads"])),
+            "service_classes": sorted(set(s for z in zones for s in z["service_classes"])),
+            "file_sources": sorted(set(z["file_source"] for z in zones)),
+            "date_range": {
+                "min": min(mins) if mins else None,
+                "max": max(maxs) if maxs else None,
+            },
+            "total_records": sum(z["records"] for z in zones),
+        }
+
+    def stats(self) -> dict:
+        """Counters for health reporting."""
+        zones = self.zones()
+        with self._lock:
+            return {
+                "segments": len(zones),
+                "epoch": self.epoch,
+                "generation": self.generation,
+                "retired_tombstones": len(self._retired),
+                "bytes_on_disk": sum(z["bytes"] for z in zones),
+                "cached_segments": len(self._cache),
+                "cached_records": self._cached_records,
+                "cache_max_records": self.cache_max_records,
+                "cache_max_segments": self.cache_max_segments,
+                "cache_hits": self.cache_hits,
+                "segments_read": self.segments_read,
+                "segments_skipped": self.segments_skipped,
+            }
+
+    # -- ingest ------------------------------------------------------------
+
+    def sync_directory(self, directory: str, pattern: str = DEFAULT_PATTERN,
+                       max_workers: int = MAX_WORKERS) -> dict:
+        """
+        Bring the store in line with the report files in `directory`.
+        Only new or modified files are parsed; segments whose source file
+        disappeared or changed are retired. All changes are published as one
+        new generation. Returns parse stats in the same shape as
+        parse_all_files, plus the store epoch and resulting generation.
+        """
+        with self._sync_lock:
+            return self._sync_directory(directory, pattern, max_workers)
+
+    def _sync_directory(self, directory: str, pattern: str, max_workers: int) -> dict:
+        files = sorted(glob.glob(os.path.join(directory, pattern)))
+        errors: List[str] = []
+        t0 = time.time()
+
+        wanted: Dict[str, str] = {}
+        to_parse: List[str] = []
+        for fp in files:
+            file_hash = _get_file_hash(fp)
+            if file_hash is None:
+                continue
+            wanted[file_hash] = fp
+            if file_hash not in self._zones:
+                to_parse.append(fp)
+
+        retired_ids = [s for s in list(self._zones) if s not in wanted]
+
+        hashes = {fp: h for h, fp in wanted.items()}
+        added: List[dict] = []
+        for filepath, records, error in iter_parse_files(to_parse, max_workers, use_cache=False):
+            filename = os.path.basename(filepath)
+            if error:
+                errors.append(f"{filename}: {error}")
+                logging.warning(f"Error parsing {filename}: {error}")
+                continue
+            try:
+                added.append(self._write_segment(filename, hashes[filepath], records))
+            except DatasetFormatError as e:
+                errors.append(f"{filename}: {e}")
+                logging.warning(f"Cannot store {filename}: {e}")
+                continue
+            logging.info(f"Parsed {filename} -> {len(records)} records")
+
+        # The whole sync becomes visible as a single generation
+        self._commit(added, retired_ids)
+
+        elapsed = time.time() - t0
+        stats = {
+            "files_parsed": len(files),
+            "files_success": len(files) - len(errors),
+            "files_failed": len(errors),
+            "file_names": [os.path.basename(f) for f in files],
+            "total_records": self.total_records,
+            "parse_time_seconds": round(elapsed, 3),
+            "errors": errors if errors else None,
+            "epoch": self.epoch,
+            "generation": self.generation,
+        }
+        logging.info(
+            f"Total: {stats['total_records']} records from {stats['files_parsed']} files "
+            f"({len(to_parse)} parsed) in {elapsed:.2f}s"
+        )
+        return stats